@@ -35,6 +35,16 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class Overlaps(dict):
+    """
+    Mapping from pairs of overlapping variables to their overlap.
+    Pairs that do not overlap are not stored, and look up as None.
+    """
+
+    def __missing__(self, key):
+        return None
+
+
 class Crossword():
 
     def __init__(self, structure_file, words_file):
@@ -104,30 +114,27 @@ class Crossword():
                             length=length
                         ))
 
+        # Find the variables through each cell, with the cell's index in each
+        crossings = dict()
+        for var in self.variables:
+            for k, cell in enumerate(var.cells):
+                crossings.setdefault(cell, []).append((var, k))
+
         # Compute overlaps for each word
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only overlapping pairs are stored; `adjacency` maps each variable
+        # to its overlapping variables and their overlaps
+        self.overlaps = Overlaps()
+        self.adjacency = {var: dict() for var in self.variables}
+        for crossing in crossings.values():
+            for v1, i in crossing:
+                for v2, j in crossing:
+                    if v1 != v2:
+                        self.overlaps[v1, v2] = (i, j)
+                        self.adjacency[v1][v2] = (i, j)
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return set(self.adjacency[var])
@@ -1,8 +1,10 @@
-import sys
+import argparse
 
 from crossword import *
 
-import copy
+import collections
+
+import itertools
 
 import random
 
@@ -12,13 +14,70 @@ class CrosswordCreator():
     def __init__(self, crossword):
         """
         Create new CSP crossword generate.
+
+        Every word in the vocabulary gets an id, its position in
+        `self.words`, and each domain is an int bitset of word ids: word
+        `self.words[k]` is in the domain of `var` if bit k of
+        `self.domains[var]` is set.
         """
         self.crossword = crossword
+
+        # Shared word table, grouped by length, and the id of each word
+        self.words = sorted(self.crossword.words, key=lambda w: (len(w), w))
+        self.index = {word: k for k, word in enumerate(self.words)}
+
+        # Bitset of the words of each length, and of the words of each
+        # (length, position) pair by the letter they have at that position
+        self.lengths = dict()
+        self.positions = dict()
+        start = 0
+        for length, group in itertools.groupby(self.words, key=len):
+            group = list(group)
+            self.lengths[length] = ((1 << len(group)) - 1) << start
+            for position in range(length):
+                ids = dict()
+                for k, word in enumerate(group):
+                    ids.setdefault(word[position], []).append(k)
+                self.positions[length, position] = {
+                    letter: bitset(letter_ids) << start
+                    for letter, letter_ids in ids.items()
+                }
+            start += len(group)
+
+        everything = (1 << len(self.words)) - 1
         self.domains = {
-            var: self.crossword.words.copy()
+            var: everything
             for var in self.crossword.variables
         }
 
+        # Undo trail of (variable, previous domain) pairs, one per pruning
+        self.trail = []
+
+        # Words used by the assignment being searched
+        self.used = set()
+
+    def domain_words(self, var):
+        """
+        Return the list of words in the domain of `var`.
+        """
+        return [self.words[k] for k in members(self.domains[var])]
+
+    def prune(self, var, domain):
+        """
+        Replace the domain of `var` with the smaller `domain`,
+        recording the previous domain on the undo trail.
+        """
+        self.trail.append((var, self.domains[var]))
+        self.domains[var] = domain
+
+    def undo(self, mark):
+        """
+        Restore every domain pruned since the trail had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, domain = self.trail.pop()
+            self.domains[var] = domain
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -89,12 +148,20 @@ class CrosswordCreator():
 
         img.save(filename)
 
-    def solve(self):
+    def solve(self, mac=False):
         """
         Enforce node and arc consistency, and then solve the CSP.
+        If `mac` is True, keep the domains arc consistent during the search.
         """
         self.enforce_node_consistency()
-        self.ac3()
+        consistent = self.ac3()
+
+        # Nothing before the search is ever undone
+        self.trail = []
+        if mac:
+            if not consistent:
+                return None
+            return self.maintain_arc_consistency(dict())
         return self.backtrack(dict())
 
     def enforce_node_consistency(self):
@@ -104,10 +171,7 @@ class CrosswordCreator():
          constraints; in this case, the length of the word.)
         """
         for var in self.crossword.variables:
-            domainlist = copy.deepcopy(self.domains[var])
-            for word in domainlist:
-                if len(word) != var.length:
-                    self.domains[var].remove(word)
+            self.domains[var] &= self.lengths.get(var.length, 0)
 
     def revise(self, x, y):
         """
@@ -119,18 +183,18 @@ class CrosswordCreator():
         False if no revision was made.
         """
         if self.crossword.overlaps[x, y] != None:
-            domainlist = copy.deepcopy(self.domains[x])
-            consistent = False
-            revised = False
-            for word in domainlist:
-                for w2 in self.domains[y]:
-                    if word[self.crossword.overlaps[x, y][0]] == w2[self.crossword.overlaps[x, y][1]]:
-                        consistent = True
-                if not consistent:
-                    self.domains[x].remove(word)
-                    revised = True
-                consistent = False
-            if revised:
+            i, j = self.crossword.overlaps[x, y]
+
+            # Keep the words of `x` whose letter at the overlap is the
+            # letter of some word of `y` there
+            candidates = self.positions.get((x.length, i), {})
+            supported = 0
+            for letter, words in self.positions.get((y.length, j), {}).items():
+                if self.domains[y] & words:
+                    supported |= candidates.get(letter, 0)
+            revised = self.domains[x] & supported
+            if revised != self.domains[x]:
+                self.prune(x, revised)
                 return True
         return False
 
@@ -144,25 +208,28 @@ class CrosswordCreator():
         return False if one or more domains end up empty.
         """
         if arcs == None:
-            queue = []
+            queue = collections.deque()
             for var_pair in self.crossword.overlaps:
                 if self.crossword.overlaps[var_pair] != None:
                     queue.append(var_pair)
         else:
-            queue = arcs
+            queue = collections.deque(dict.fromkeys(arcs))
+        queued = set(queue)
 
         while queue:
-            arc = queue.pop(0)
+            arc = queue.popleft()
+            queued.remove(arc)
             x = arc[0]
             y = arc[1]
             if self.revise(x, y):
-                if len(self.domains[x]) == 0:
+                if not self.domains[x]:
                     return False
                 for neighbor in self.crossword.neighbors(x):
                     if neighbor == y:
                         continue
-                    if (neighbor, x) not in queue:
+                    if (neighbor, x) not in queued:
                         queue.append((neighbor, x))
+                        queued.add((neighbor, x))
         return True
 
     def assignment_complete(self, assignment):
@@ -195,6 +262,35 @@ class CrosswordCreator():
                 return False
         return True
 
+    def consistent_with(self, var, word, assignment):
+        """
+        Return True if assigning `word` to `var` keeps the consistent
+        `assignment` consistent; return False otherwise.
+        Only the neighbors of `var` are checked, and words already used
+        are looked up in `self.used`.
+        """
+        if len(word) != var.length or word in self.used:
+            return False
+        for neighbor in self.crossword.neighbors(var):
+            if neighbor in assignment:
+                i, j = self.crossword.overlaps[var, neighbor]
+                if word[i] != assignment[neighbor][j]:
+                    return False
+        return True
+
+    def assign(self, var, word, assignment):
+        """
+        Add `var` = `word` to `assignment` and mark the word as used.
+        """
+        assignment[var] = word
+        self.used.add(word)
+
+    def unassign(self, var, assignment):
+        """
+        Remove `var` from `assignment` and free its word.
+        """
+        self.used.discard(assignment.pop(var))
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -204,27 +300,36 @@ class CrosswordCreator():
         """
         #get neighbors
         #eliminate assigned
-        #check all domains against var values
-        #by counting failed words
+        #count, for each letter at the overlap, the neighbor words it keeps
+        #a word rules out the rest, plus itself if the letter count kept it
 
-        neighbors = self.crossword.neighbors(var)
+        neighbors = [
+            neighbor for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
+        agreeing = []
         for neighbor in neighbors:
-            if neighbor in assignment:
-                neighbors.remove(neighbor)
+            i, j = self.crossword.overlaps[var, neighbor]
+            domain = self.domains[neighbor]
+            counts = {
+                letter: count(domain & words)
+                for letter, words in self.positions.get(
+                    (neighbor.length, j), {}
+                ).items()
+            }
+            agreeing.append((neighbor, i, j, domain, count(domain), counts))
+
         ordered_values = dict()
-        for word in self.domains[var]:
-            for neighbor in neighbors:
-                for w2 in self.domains[neighbor]:
-                    if word[self.crossword.overlaps[var, neighbor][0]] != w2[self.crossword.overlaps[var, neighbor][1]] or word == w2:
-                        if not ordered_values[word]:
-                            ordered_values[word] = 1
-                        else:
-                            ordered_values[word] += 1
-        orderedList = sorted(ordered_values.items() , key=lambda t : t[1])
-        order = []
-        for keyvalue in orderedList:
-            order.append(keyvalue[0])
-        return order
+        for k in members(self.domains[var]):
+            word = self.words[k]
+            ruled_out = 0
+            for neighbor, i, j, domain, total, counts in agreeing:
+                ruled_out += total - counts.get(word[i], 0)
+                if (neighbor.length == var.length and word[j] == word[i]
+                        and domain >> k & 1):
+                    ruled_out += 1
+            ordered_values[word] = ruled_out
+        return sorted(ordered_values, key=lambda word: ordered_values[word])
 
 
     def select_unassigned_variable(self, assignment):
@@ -246,11 +351,12 @@ class CrosswordCreator():
             if var in assignment:
                 continue
             else:
-                if len(self.domains[var]) < minimum:
-                    minimum = len(self.domains[var])
+                remaining = count(self.domains[var])
+                if remaining < minimum:
+                    minimum = remaining
                     del tied[:]
                     tied.append(var)
-                elif len(self.domains[var]) == minimum:
+                elif remaining == minimum:
                     tied.append(var)
         if len(tied) > 1:
             for var in tied:
@@ -279,34 +385,136 @@ class CrosswordCreator():
 
         If no assignment is possible, return None.
         """
+        self.used = set(assignment.values())
+        return self._backtrack(assignment)
+
+    def _backtrack(self, assignment):
+        """
+        Search below `assignment`, whose words are in `self.used`.
+        """
         if self.assignment_complete(assignment):
             return assignment
         var = self.select_unassigned_variable(assignment)
-        for word in self.domains[var]:
-            assignment[var] = word
-            if self.consistent(assignment):
-                solution = self.backtrack(assignment)
+        for word in self.domain_words(var):
+            if self.consistent_with(var, word, assignment):
+                self.assign(var, word, assignment)
+                solution = self._backtrack(assignment)
                 if solution != None:
                     return solution
-        assignment.pop(var)
+                self.unassign(var, assignment)
         return None
 
+    def maintain_arc_consistency(self, assignment):
+        """
+        Like `backtrack`, but after each tentative assignment shrink the
+        variable's domain to its word, drop the word from the domains of
+        the other unassigned variables, and run `ac3` on the arcs into the
+        variables that changed. Prunings are recorded on the undo trail and
+        rolled back when the assignment is abandoned.
 
-def main():
+        If no assignment is possible, return None.
+        """
+        self.used = set(assignment.values())
+        return self._maintain_arc_consistency(assignment)
+
+    def _maintain_arc_consistency(self, assignment):
+        """
+        Search below `assignment`, whose words are in `self.used`.
+        """
+        if self.assignment_complete(assignment):
+            return assignment
+        var = self.select_unassigned_variable(assignment)
+        for word in self.order_domain_values(var, assignment):
+            if not self.consistent_with(var, word, assignment):
+                continue
+            mark = len(self.trail)
+            self.assign(var, word, assignment)
+            if self.propagate(var, assignment):
+                solution = self._maintain_arc_consistency(assignment)
+                if solution != None:
+                    return solution
+            self.undo(mark)
+            self.unassign(var, assignment)
+        return None
 
-    # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+    def propagate(self, var, assignment):
+        """
+        Prune the domains of the unassigned variables after `var` has been
+        assigned a word in `assignment`, and restore arc consistency.
+
+        Return False if some domain ends up empty.
+        """
+        bit = 1 << self.index[assignment[var]]
+        self.prune(var, bit)
+        changed = [var]
+        for other in self.crossword.variables:
+            if other not in assignment and self.domains[other] & bit:
+                self.prune(other, self.domains[other] & ~bit)
+                if not self.domains[other]:
+                    return False
+                changed.append(other)
+
+        arcs = [
+            (neighbor, other)
+            for other in changed
+            for neighbor in self.crossword.neighbors(other)
+            if neighbor not in assignment
+        ]
+        return self.ac3(arcs)
+
+
+def bitset(ids):
+    """
+    Return the bitset with the bits in the list of word `ids` set.
+    """
+    if not ids:
+        return 0
+    bits = bytearray(b"0") * (max(ids) + 1)
+    for k in ids:
+        bits[k] = ord("1")
+    return int(bits[::-1], 2)
+
+
+def count(domain):
+    """
+    Return the number of words in the bitset `domain`.
+    """
+    return bin(domain).count("1")
+
+
+def members(domain):
+    """
+    Return the list of word ids in the bitset `domain`, in increasing order.
+    """
+    bits = bin(domain)[:1:-1]
+    ids = []
+    k = bits.find("1")
+    while k >= 0:
+        ids.append(k)
+        k = bits.find("1", k + 1)
+    return ids
+
+
+def main():
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    parser = argparse.ArgumentParser(
+        usage="python generate.py structure words [output] [--mac]"
+    )
+    parser.add_argument("structure")
+    parser.add_argument("words")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument(
+        "--mac", action="store_true",
+        help="maintain arc consistency after every assignment"
+    )
+    args = parser.parse_args()
+    output = args.output
 
     # Generate crossword
-    crossword = Crossword(structure, words)
+    crossword = Crossword(args.structure, args.words)
     creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    assignment = creator.solve(args.mac)
 
     # Print result
     if assignment is None:
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from crossword import Crossword
+from generate import CrosswordCreator
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def creator(structure, words):
+    crossword = Crossword(
+        os.path.join(DATA, structure), os.path.join(DATA, words)
+    )
+    creator = CrosswordCreator(crossword)
+    creator.enforce_node_consistency()
+    return creator
+
+
+@pytest.mark.parametrize("structure, words", [
+    ("structure0.txt", "words0.txt"),
+    ("structure1.txt", "words1.txt"),
+])
+def test_ac3_ignores_repeated_arcs(structure, words):
+    arcs = [
+        pair for pair, overlap in creator(structure, words).crossword
+        .overlaps.items() if overlap is not None
+    ]
+    for arc in arcs:
+        once = creator(structure, words)
+        twice = creator(structure, words)
+        assert twice.ac3([arc, arc]) == once.ac3([arc])
+        assert twice.domains == once.domains
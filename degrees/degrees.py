@@ -1,61 +1,71 @@
-import csv
+import argparse
+import json
+import multiprocessing
 import sys
 
+from distance import LANDMARKS, LandmarkIndex, SearchTree
+from graph import CACHE_SIZE, StarGraph
+from namesearch import SUGGESTIONS, NameIndex
 from util import Node, StackFrontier, QueueFrontier
 
-# Maps names to a set of corresponding person_ids
-names = {}
+# Bipartite star graph over dense person and movie indices
+graph = StarGraph()
 
-# Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
-people = {}
+# Landmark distance index, built on demand by build_landmarks
+landmarks = None
 
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
-movies = {}
+# Fuzzy name index, built on demand by build_name_index
+name_index = None
 
 
 def load_data(directory):
     """
-    Load data from CSV files into memory.
+    Load data from CSV files into memory, using the directory's
+    binary snapshot when it is newer than the CSV files.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    global landmarks, name_index
+    graph.load(directory)
+    landmarks = None
+    name_index = None
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [directory] [--batch FILE] [--workers N] "
+              "[--cache-size N] [--dedupe]"
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument(
+        "--batch", metavar="FILE",
+        help="answer tab-separated name pairs from FILE ('-' for stdin) "
+             "as JSON lines"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of processes answering batch queries"
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=CACHE_SIZE,
+        help="number of people whose neighbors are cached"
+    )
+    parser.add_argument(
+        "--dedupe", action="store_true",
+        help="expand each co-star through a single shared movie"
+    )
+    args = parser.parse_args()
+    directory = args.directory
+    graph.configure_cache(args.cache_size, args.dedupe)
+
+    if args.batch is not None:
+        load_data(directory)
+        if args.batch == "-":
+            f = sys.stdin
+        else:
+            f = open(args.batch, encoding="utf-8")
+        with f:
+            for line in run_batch(read_pairs(f), directory, args.workers):
+                print(line, flush=True)
+        return
 
     # Load data from files into memory
     print("Loading data...")
@@ -69,18 +79,18 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path, num_explored = bidirectional_search(source, target)
 
     if path is None:
         print("Not connected.")
     else:
         degrees = len(path)
-        print(f"{degrees} degrees of separation.")
+        print(f"{degrees} degrees of separation ({num_explored} people explored).")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_name(path[i][1])
+            person2 = person_name(path[i + 1][1])
+            movie = movie_title(path[i + 1][0])
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -91,9 +101,9 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
-    num_explored = 0
+    target = graph.person_index[target]
 
-    start = Node(state=source, parent=None, action=None)
+    start = Node(state=graph.person_index[source], parent=None, action=None)
     frontier = QueueFrontier()
     frontier.add(start)
 
@@ -105,7 +115,6 @@ def shortest_path(source, target):
             return None
 
         node = frontier.remove()
-        num_explored += 1
 
         if node.state == target:
             degrees = []
@@ -115,40 +124,313 @@ def shortest_path(source, target):
                 degrees.append(movie_and_actor)
                 node = node.parent
             degrees.reverse()
-            return degrees
+            return path_ids(degrees)
 
         explored.add(node.state)
 
-        for action, state in neighbors_for_person(node.state):
+        for action, state in graph.neighbors(node.state):
             if not frontier.contains_state(state) and state not in explored:
                 child = Node(state=state, parent=node, action=action)
                 frontier.add(child)
 
 
+def bidirectional_search(source, target):
+    """
+    Returns a tuple (path, num_explored), where path is the shortest list
+    of (movie_id, person_id) pairs that connect the source to the target,
+    or None if no possible path, and num_explored is the number of people
+    whose neighbors were expanded.
+
+    Grows one breadth-first frontier from the source and one from the
+    target, always expanding a full layer of the smaller frontier, and
+    stops as soon as the two searches meet.
+    """
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+    if source == target:
+        return [], 0
+
+    # Maps each reached person to the (movie, person) step that
+    # leads back towards the side's origin
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+    num_explored = 0
+
+    while forward_layer and backward_layer:
+
+        # Expand the cheaper side
+        expand_forward = len(forward_layer) <= len(backward_layer)
+        if expand_forward:
+            layer, visited, other = forward_layer, forward, backward
+        else:
+            layer, visited, other = backward_layer, backward, forward
+
+        next_layer = []
+        for person in layer:
+            num_explored += 1
+            for movie, neighbor in graph.neighbors(person):
+                if neighbor in visited:
+                    continue
+                visited[neighbor] = (movie, person)
+                if neighbor in other:
+                    path = _join_paths(forward, backward, neighbor)
+                    return path_ids(path), num_explored
+                next_layer.append(neighbor)
+
+        if expand_forward:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    return None, num_explored
+
+
+def single_source(source):
+    """
+    Runs one breadth-first search from the source over the whole graph.
+    Returns the resulting search tree, from which `tree_path` reads back
+    the path to any number of targets.
+    """
+    return SearchTree(graph, graph.person_index[source])
+
+
+def tree_path(tree, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source of `tree` to the target.
+
+    If no possible path, returns None.
+    """
+    path = tree.path(graph.person_index[target])
+    return None if path is None else path_ids(path)
+
+
+def build_landmarks(count=LANDMARKS):
+    """
+    Builds the landmark distance index used by `distance_bounds`.
+    """
+    global landmarks
+    landmarks = LandmarkIndex(graph, count)
+
+
+def distance_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    the source and the target, building the landmark index if needed.
+    """
+    if landmarks is None:
+        build_landmarks()
+    return landmarks.bounds(
+        graph.person_index[source], graph.person_index[target]
+    )
+
+
+def _join_paths(forward, backward, meeting):
+    """
+    Returns the (movie, person) path from the forward search's origin
+    to the backward search's origin that passes through `meeting`.
+    """
+    path = []
+    person = meeting
+    while forward[person] is not None:
+        movie, parent = forward[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+
+    person = meeting
+    while backward[person] is not None:
+        movie, child = backward[person]
+        path.append((movie, child))
+        person = child
+    return path
+
+
+def path_ids(path):
+    """
+    Converts a list of (movie, person) index pairs into
+    a list of (movie_id, person_id) pairs.
+    """
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def read_pairs(f):
+    """
+    Yields (source, target) name pairs from the tab-separated lines of
+    file `f`, skipping blank lines.
+    """
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        source, _, target = line.partition("\t")
+        yield source.strip(), target.strip()
+
+
+def run_batch(pairs, directory, workers=1):
+    """
+    Answers every (source, target) name pair against the loaded graph,
+    yielding one JSON line per pair in input order.
+
+    With more than one worker, pairs are answered by a process pool. Forked
+    workers share the already loaded read-only graph and name index; under
+    other start methods each worker loads the graph from `directory`,
+    which is fast once the snapshot exists, with the same neighbor cache
+    configuration, and builds its own name index.
+    """
+    if workers <= 1:
+        for pair in pairs:
+            yield json.dumps(answer_query(pair))
+        return
+
+    # Build the name index once so that forked workers share it
+    build_name_index()
+    cache_size = graph.cache_info().maxsize
+    with multiprocessing.Pool(
+        workers, initializer=_init_worker,
+        initargs=(directory, cache_size, graph.dedupe)
+    ) as pool:
+        for result in pool.imap(answer_query, pairs, chunksize=16):
+            yield json.dumps(result)
+
+
+def _init_worker(directory, cache_size, dedupe):
+    """
+    Loads the dataset, neighbor cache configuration and name index
+    in a batch worker that did not inherit them.
+    """
+    if not len(graph):
+        graph.configure_cache(cache_size, dedupe)
+        load_data(directory)
+        build_name_index()
+
+
+def answer_query(pair):
+    """
+    Returns a JSON-serialisable dict answering one (source, target)
+    name pair without prompting.
+    """
+    result = {"source": pair[0], "target": pair[1]}
+    person_ids = []
+    for name in pair:
+        matches = person_ids_for_name(name)
+        if len(matches) != 1:
+            result["error"] = "not found" if not matches else "ambiguous"
+            result["name"] = name
+            if not matches:
+                matches = suggest_people(name)
+            result["candidates"] = [person_record(match) for match in matches]
+            return result
+        person_ids.append(matches[0])
+
+    path, num_explored = bidirectional_search(*person_ids)
+    result["explored"] = num_explored
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {
+                "movie_id": movie_id,
+                "title": movie_title(movie_id),
+                "person_id": person_id,
+                "name": person_name(person_id)
+            }
+            for movie_id, person_id in path
+        ]
+    return result
+
+
+def person_ids_for_name(name):
+    """
+    Returns the list of IMDB ids for a person's name. A name of the
+    form "#<id>" refers to the person with that IMDB id directly.
+    """
+    if name.startswith("#"):
+        return [name[1:]] if name[1:] in graph.person_index else []
+    return [
+        graph.person_ids[person]
+        for person in graph.names.get(name.lower(), [])
+    ]
+
+
+def person_record(person_id):
+    """
+    Returns a dict describing the person with the given IMDB id.
+    """
+    person = graph.person_index[person_id]
+    return {
+        "person_id": person_id,
+        "name": graph.person_names[person],
+        "birth": graph.person_births[person]
+    }
+
+
+def build_name_index():
+    """
+    Builds the fuzzy name index used by `suggest_people`, if needed.
+    """
+    global name_index
+    if name_index is None:
+        name_index = NameIndex(graph)
+
+
+def suggest_people(name, limit=SUGGESTIONS):
+    """
+    Returns the IMDB ids of up to `limit` people whose names best match
+    a possibly misspelled or partial name, best match first.
+    """
+    build_name_index()
+    return [graph.person_ids[person] for person in name_index.search(name, limit)]
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
-    resolving ambiguities as needed.
+    resolving ambiguities and suggesting close matches as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
-    if len(person_ids) == 0:
-        return None
+    person_ids = person_ids_for_name(name)
+    if len(person_ids) == 1:
+        return person_ids[0]
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
-        return None
     else:
-        return person_ids[0]
+        person_ids = suggest_people(name)
+        if len(person_ids) == 0:
+            return None
+        print(f"No exact match for '{name}'. Did you mean:")
+    for person_id in person_ids:
+        person = graph.person_index[person_id]
+        name = graph.person_names[person]
+        birth = graph.person_births[person]
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def person_name(person_id):
+    """
+    Returns the name of the person with the given IMDB id.
+    """
+    return graph.person_names[graph.person_index[person_id]]
+
+
+def movie_title(movie_id):
+    """
+    Returns the title of the movie with the given IMDB id.
+    """
+    return graph.movie_titles[graph.movie_index[movie_id]]
 
 
 def neighbors_for_person(person_id):
@@ -156,12 +438,7 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
-    neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
-    return neighbors
+    return set(path_ids(graph.neighbors(graph.person_index[person_id])))
 
 
 if __name__ == "__main__":
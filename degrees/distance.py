@@ -0,0 +1,110 @@
+import math
+from array import array
+
+# Default number of landmarks in a LandmarkIndex
+LANDMARKS = 16
+
+
+class SearchTree():
+    """
+    Breadth-first search tree of every person reachable from `source`.
+
+    For each person index, `distances` holds the number of degrees from the
+    source (-1 if unreachable), and `parents` and `movies` hold the person
+    and movie through which that person was first reached.
+    """
+
+    def __init__(self, graph, source):
+        self.source = source
+        self.distances = array("i", [-1]) * len(graph)
+        self.parents = array("i", [-1]) * len(graph)
+        self.movies = array("i", [-1]) * len(graph)
+        self.distances[source] = 0
+
+        layer = [source]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for person in layer:
+                for movie, neighbor in graph.neighbors(person):
+                    if self.distances[neighbor] < 0:
+                        self.distances[neighbor] = depth
+                        self.parents[neighbor] = person
+                        self.movies[neighbor] = movie
+                        next_layer.append(neighbor)
+            layer = next_layer
+
+    def distance(self, target):
+        """
+        Return the number of degrees between the source and `target`,
+        or None if they are not connected.
+        """
+        distance = self.distances[target]
+        return None if distance < 0 else distance
+
+    def path(self, target):
+        """
+        Return the shortest list of (movie, person) index pairs that
+        connect the source to `target`, or None if they are not connected.
+        """
+        if self.distances[target] < 0:
+            return None
+        path = []
+        while target != self.source:
+            path.append((self.movies[target], target))
+            target = self.parents[target]
+        path.reverse()
+        return path
+
+
+class LandmarkIndex():
+    """
+    Distances from a few well-connected landmark people to everyone else,
+    giving instant bounds on the degrees between any two people through
+    the triangle inequality.
+    """
+
+    def __init__(self, graph, count=LANDMARKS):
+
+        # Prefer people who can reach many others in one step
+        degrees = [
+            sum(
+                len(graph.stars_for(movie))
+                for movie in graph.movies_for(person)
+            )
+            for person in range(len(graph))
+        ]
+        candidates = sorted(
+            range(len(graph)), key=lambda person: degrees[person], reverse=True
+        )
+        self.landmarks = candidates[:count]
+        self.distances = [
+            SearchTree(graph, landmark).distances
+            for landmark in self.landmarks
+        ]
+
+    def bounds(self, source, target):
+        """
+        Return (lower, upper) bounds on the number of degrees between the
+        person indices `source` and `target`. The upper bound is math.inf if
+        no landmark reaches both people; both bounds are math.inf if the two
+        are known not to be connected.
+        """
+        if source == target:
+            return 0, 0
+
+        lower = 0
+        upper = math.inf
+        for distances in self.distances:
+            to_source = distances[source]
+            to_target = distances[target]
+            if to_source < 0 and to_target < 0:
+                continue
+            if to_source < 0 or to_target < 0:
+                return math.inf, math.inf
+            lower = max(lower, abs(to_source - to_target))
+            upper = min(upper, to_source + to_target)
+
+        # Distinct people are at least one degree apart
+        return max(lower, 1), upper
@@ -0,0 +1,331 @@
+import csv
+import functools
+import mmap
+import os
+import struct
+from array import array
+
+# Files a dataset directory is loaded from, in snapshot signature order
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Name of the binary snapshot written next to the CSV files
+SNAPSHOT = ".degrees.snapshot"
+
+# Snapshot layout: magic, then source sizes and mtimes, then the lengths of
+# the four adjacency arrays and of the six string tables
+MAGIC = b"DEGSNAP1"
+HEADER = struct.Struct("<8s6q4q6q")
+
+# Default number of people whose neighbor lists are kept in the LRU cache
+CACHE_SIZE = 10000
+
+
+class StarGraph():
+    """
+    Bipartite graph of people and the movies they starred in.
+
+    People and movies are addressed by dense integer indices. Adjacency is
+    stored in compressed sparse row form: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and the stars
+    of movie `m` are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE, dedupe=False):
+        self.configure_cache(cache_size, dedupe)
+        self.clear()
+
+    def clear(self):
+        """
+        Reset the graph to an empty dataset.
+        """
+
+        # Per-person columns, indexed by person index
+        self.person_ids = []
+        self.person_names = []
+        self.person_births = []
+
+        # Per-movie columns, indexed by movie index
+        self.movie_ids = []
+        self.movie_titles = []
+        self.movie_years = []
+
+        # Maps IMDB ids to indices
+        self.person_index = {}
+        self.movie_index = {}
+
+        # Maps lowercase names to a list of person indices
+        self.names = {}
+
+        # Adjacency arrays
+        self.person_offsets = array("i", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("i", [0])
+        self.movie_stars = array("i")
+
+        if hasattr(self, "_cached_neighbors"):
+            self._cached_neighbors.cache_clear()
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def load(self, directory):
+        """
+        Load the dataset in `directory`, reading its binary snapshot if it
+        is still up to date, and otherwise parsing the CSV files and
+        writing a fresh snapshot for the next run.
+        """
+        path = os.path.join(directory, SNAPSHOT)
+        signature = source_signature(directory)
+        if self.load_snapshot(path, signature):
+            return
+        self.load_csv(directory)
+        try:
+            self.save_snapshot(path, signature)
+        except OSError:
+            pass
+
+    def load_csv(self, directory):
+        """
+        Load people, movies and stars from the CSV files in `directory`.
+        """
+        self.clear()
+
+        # Load people
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                person = len(self.person_ids)
+                self.person_ids.append(row["id"])
+                self.person_names.append(row["name"])
+                self.person_births.append(row["birth"])
+                self.person_index[row["id"]] = person
+                self.names.setdefault(row["name"].lower(), []).append(person)
+
+        # Load movies
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                movie = len(self.movie_ids)
+                self.movie_ids.append(row["id"])
+                self.movie_titles.append(row["title"])
+                self.movie_years.append(row["year"])
+                self.movie_index[row["id"]] = movie
+
+        # Load stars as parallel edge columns
+        star_people = array("i")
+        star_movies = array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                person = self.person_index.get(row["person_id"])
+                movie = self.movie_index.get(row["movie_id"])
+                if person is None or movie is None:
+                    continue
+                star_people.append(person)
+                star_movies.append(movie)
+
+        self.person_offsets, self.person_movies = compress(
+            star_people, star_movies, len(self.person_ids)
+        )
+        self.movie_offsets, self.movie_stars = compress(
+            star_movies, star_people, len(self.movie_ids)
+        )
+
+    def save_snapshot(self, path, signature):
+        """
+        Write the graph to a binary snapshot at `path`, tagged with the
+        `signature` of the CSV files it was loaded from.
+        """
+        arrays = [
+            self.person_offsets, self.person_movies,
+            self.movie_offsets, self.movie_stars
+        ]
+        tables = [
+            "".join(f"{value}\0" for value in column).encode("utf-8")
+            for column in self.string_columns()
+        ]
+        header = HEADER.pack(
+            MAGIC, *signature,
+            *(len(values) for values in arrays),
+            *(len(table) for table in tables)
+        )
+
+        # Write to a temporary file first so readers never see a partial file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(header)
+            for values in arrays:
+                f.write(pad(f.tell()))
+                values.tofile(f)
+            for table in tables:
+                f.write(table)
+        os.replace(temporary, path)
+
+    def load_snapshot(self, path, signature):
+        """
+        Load the graph from the binary snapshot at `path`.
+        Return False, leaving the graph untouched, if there is no snapshot
+        or it was written for a different `signature`.
+        """
+        try:
+            with open(path, "rb") as f:
+                view = memoryview(mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                ))
+        except (OSError, ValueError):
+            return False
+        if len(view) < HEADER.size:
+            return False
+        fields = HEADER.unpack_from(view)
+        if fields[0] != MAGIC or list(fields[1:7]) != list(signature):
+            return False
+        size = HEADER.size
+        for length in fields[7:11]:
+            size += len(pad(size)) + 4 * length
+        if size + sum(fields[11:17]) != len(view):
+            return False
+
+        # Map the adjacency arrays straight out of the file
+        arrays = []
+        offset = HEADER.size
+        for length in fields[7:11]:
+            offset += len(pad(offset))
+            arrays.append(view[offset:offset + 4 * length].cast("i"))
+            offset += 4 * length
+
+        # Split the string tables back into columns
+        columns = []
+        for length in fields[11:17]:
+            table = bytes(view[offset:offset + length]).decode("utf-8")
+            columns.append(table.split("\0")[:-1])
+            offset += length
+
+        self.clear()
+        (self.person_offsets, self.person_movies,
+         self.movie_offsets, self.movie_stars) = arrays
+        (self.person_ids, self.person_names, self.person_births,
+         self.movie_ids, self.movie_titles, self.movie_years) = columns
+
+        for person, person_id in enumerate(self.person_ids):
+            self.person_index[person_id] = person
+        for movie, movie_id in enumerate(self.movie_ids):
+            self.movie_index[movie_id] = movie
+        for person, name in enumerate(self.person_names):
+            self.names.setdefault(name.lower(), []).append(person)
+        return True
+
+    def string_columns(self):
+        """
+        Return the graph's string columns in snapshot order.
+        """
+        return [
+            self.person_ids, self.person_names, self.person_births,
+            self.movie_ids, self.movie_titles, self.movie_years
+        ]
+
+    def movies_for(self, person):
+        """
+        Return an array of the movie indices `person` starred in.
+        """
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_for(self, movie):
+        """
+        Return an array of the person indices that starred in `movie`.
+        """
+        offsets = self.movie_offsets
+        return self.movie_stars[offsets[movie]:offsets[movie + 1]]
+
+    def configure_cache(self, cache_size=CACHE_SIZE, dedupe=False):
+        """
+        Keep the neighbor lists of the `cache_size` most recently expanded
+        people in an LRU cache (unbounded if None, disabled if 0).
+        If `dedupe` is True, each co-star is reported once, through the
+        first movie they share with the person.
+        """
+        self.dedupe = dedupe
+        self._cached_neighbors = functools.lru_cache(maxsize=cache_size)(
+            self._neighbors
+        )
+
+    def cache_info(self):
+        """
+        Return the hits, misses, maxsize and currsize of the neighbor cache.
+        """
+        return self._cached_neighbors.cache_info()
+
+    def neighbors(self, person):
+        """
+        Return a tuple of (movie, person) index pairs for people
+        who starred with `person`.
+        """
+        return self._cached_neighbors(person)
+
+    def _neighbors(self, person):
+        """
+        Compute the uncached neighbor tuple returned by `neighbors`.
+        """
+        if self.dedupe:
+            neighbors = {}
+            for movie in self.movies_for(person):
+                for star in self.stars_for(movie):
+                    if star != person and star not in neighbors:
+                        neighbors[star] = movie
+            return tuple((movie, star) for star, movie in neighbors.items())
+
+        neighbors = []
+        for movie in self.movies_for(person):
+            for star in self.stars_for(movie):
+                neighbors.append((movie, star))
+        return tuple(neighbors)
+
+
+def source_signature(directory):
+    """
+    Return the sizes and modification times of the CSV files in
+    `directory`, used to tell whether a snapshot is stale.
+    """
+    signature = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        signature.extend([stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def pad(offset):
+    """
+    Return the zero bytes needed to align `offset` to 8 bytes.
+    """
+    return bytes(-offset % 8)
+
+
+def compress(rows, cols, size):
+    """
+    Given parallel arrays of (row, col) edges over `size` rows, return
+    (offsets, indices) arrays in compressed sparse row form. Columns
+    within each row are sorted and duplicate edges are dropped.
+    """
+    counts = array("i", bytes(4 * (size + 1)))
+    for row in rows:
+        counts[row + 1] += 1
+    for row in range(size):
+        counts[row + 1] += counts[row]
+
+    cursor = counts[:size]
+    indices = array("i", bytes(4 * len(rows)))
+    for row, col in zip(rows, cols):
+        indices[cursor[row]] = col
+        cursor[row] += 1
+
+    # Sort and deduplicate each row in place
+    offsets = array("i", [0])
+    end = 0
+    for row in range(size):
+        cols = sorted(set(indices[counts[row]:counts[row + 1]]))
+        indices[end:end + len(cols)] = array("i", cols)
+        end += len(cols)
+        offsets.append(end)
+    del indices[end:]
+
+    return offsets, indices
@@ -0,0 +1,104 @@
+import bisect
+import math
+import re
+from array import array
+
+# Default number of candidates returned by NameIndex.search
+SUGGESTIONS = 10
+
+# Fraction of the query's trigrams a candidate name must share
+MIN_SHARED = 0.5
+
+# Most names scored by trigram similarity for a single query
+MAX_CANDIDATES = 200
+
+
+class NameIndex():
+    """
+    Prefix and trigram index over the distinct names in a StarGraph,
+    used to suggest people for misspelled or partial names.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+        # Distinct lowercase names, and their normalized forms in sorted order
+        self.keys = list(graph.names)
+        self.normalized = [normalize(key) for key in self.keys]
+        self.order = sorted(
+            range(len(self.keys)), key=lambda key: self.normalized[key]
+        )
+        self.sorted_names = [self.normalized[key] for key in self.order]
+
+        # Maps each trigram to an array of the keys containing it
+        self.trigrams = {}
+        for key, name in enumerate(self.normalized):
+            for trigram in trigrams(name):
+                postings = self.trigrams.get(trigram)
+                if postings is None:
+                    postings = self.trigrams[trigram] = array("i")
+                postings.append(key)
+
+    def search(self, query, limit=SUGGESTIONS):
+        """
+        Return up to `limit` person indices whose names best match `query`,
+        best match first. Exact matches rank above names that start with
+        the query, which rank above names that merely look similar.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        scores = {}
+
+        # Names starting with the query
+        start = bisect.bisect_left(self.sorted_names, query)
+        for position in range(start, len(self.sorted_names)):
+            if len(scores) >= limit:
+                break
+            name = self.sorted_names[position]
+            if not name.startswith(query):
+                break
+            scores[self.order[position]] = 2 if name == query else 1
+
+        # Names sharing enough trigrams with the query: any such name must
+        # appear in at least one of the rarest postings lists
+        wanted = trigrams(query)
+        shared = math.ceil(len(wanted) * MIN_SHARED)
+        postings = sorted(
+            (self.trigrams.get(trigram, ()) for trigram in wanted), key=len
+        )
+        candidates = set()
+        for keys in postings[:len(wanted) - shared + 1]:
+            if len(candidates) >= MAX_CANDIDATES:
+                break
+            candidates.update(keys[:MAX_CANDIDATES])
+        for key in candidates:
+            padded = f"  {self.normalized[key]} "
+            common = sum(1 for trigram in wanted if trigram in padded)
+            similarity = 2 * common / (len(wanted) + len(padded) - 2)
+            scores[key] = scores.get(key, 0) + similarity
+
+        ranked = sorted(scores, key=lambda key: (-scores[key], self.keys[key]))
+        people = []
+        for key in ranked:
+            people.extend(self.graph.names[self.keys[key]])
+        return people[:limit]
+
+
+def normalize(name):
+    """
+    Return `name` lowercased, with punctuation dropped and runs of
+    whitespace collapsed.
+    """
+    name = re.sub(r"[^\w\s]", "", name.lower())
+    return " ".join(name.split())
+
+
+def trigrams(name):
+    """
+    Return the set of character trigrams of `name`, padded so that
+    word boundaries count.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
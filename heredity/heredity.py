@@ -1,6 +1,13 @@
+import argparse
 import csv
+import functools
 import itertools
-import sys
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
 
 PROBS = {
 
@@ -36,16 +43,166 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Possible numbers of copies of the gene a person can have
+GENES = (0, 1, 2)
+
+# Inference methods selectable from the command line
+METHODS = ("eliminate", "tabulate", "enumerate", "sample")
+
+# Number of leading people whose gene counts are fixed per chunk when
+# tabulating, giving 3 ** CHUNK_PREFIX chunks
+CHUNK_PREFIX = 4
+
+# Default number of sweeps when sampling, the most sweeps discarded before
+# estimating, and the fewest batches of sweeps compared to estimate
+# standard errors once there are enough sweeps
+SAMPLES = 10000
+BURN_IN = 1000
+MIN_BATCHES = 10
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        usage="python heredity.py data.csv [--method METHOD] [--workers N] "
+              "[--samples N] [--seconds S] [--seed N] [--batch]"
+    )
+    parser.add_argument("data")
+    parser.add_argument(
+        "--method", choices=METHODS, default="eliminate",
+        help="exact inference by variable elimination (default), by "
+             "tabulating every gene assignment, or by enumerating every "
+             "gene and trait assignment; or approximate inference by "
+             "sampling"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of processes tabulating chunks of gene assignments, "
+             "or evaluating families with --batch"
+    )
+    parser.add_argument(
+        "--samples", type=int, default=SAMPLES,
+        help="most sweeps over everyone's genes when sampling"
+    )
+    parser.add_argument(
+        "--seconds", type=float,
+        help="most time to spend sampling"
+    )
+    parser.add_argument(
+        "--seed", type=int,
+        help="random seed for reproducible sampling"
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="treat data as a directory and print one JSON line for each "
+             "CSV file in it"
+    )
+    args = parser.parse_args()
+    if args.samples < 1:
+        parser.error("--samples must be positive")
+    options = {
+        "method": args.method,
+        "samples": args.samples,
+        "seconds": args.seconds,
+        "seed": args.seed
+    }
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    if args.batch:
+        filenames = sorted(
+            os.path.join(args.data, filename)
+            for filename in os.listdir(args.data)
+            if filename.endswith(".csv")
+        )
+        for line in run_batch(filenames, args.workers, **options):
+            print(line, flush=True)
+        return
+
+    people = load_data(args.data)
+    probabilities, errors = infer(people, workers=args.workers, **options)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    error = errors[person][field][value]
+                    if error is None:
+                        print(f"    {value}: {p:.4f} ± ?")
+                    else:
+                        print(f"    {value}: {p:.4f} ± {error:.4f}")
+
+
+def infer(people, method="eliminate", workers=1, samples=SAMPLES,
+          seconds=None, seed=None):
+    """
+    Compute every person's gene and trait distributions with the inference
+    `method`. Return a tuple (probabilities, errors), where `errors` holds
+    standard errors when sampling and is None for the exact methods.
+    """
+    if method == "eliminate":
+        return eliminate_probabilities(people), None
+    elif method == "tabulate":
+        return tabulate_probabilities(people, workers), None
+    elif method == "sample":
+        return sample_probabilities(people, samples, seconds, seed)
+    else:
+        return enumerate_probabilities(people), None
+
+
+def run_batch(filenames, workers=1, **options):
+    """
+    Evaluate the family in each CSV file of `filenames`, yielding one JSON
+    line per family in input order. `options` are passed on to `infer`.
+
+    With more than one worker, families are evaluated by a process pool.
+    The factor tables are built before the pool starts, so that forked
+    workers share them instead of each computing their own.
+    """
+    evaluate = functools.partial(evaluate_family, **options)
+    if workers <= 1:
+        for filename in filenames:
+            yield json.dumps(evaluate(filename), allow_nan=False)
+        return
+
+    for founder, trait in itertools.product(
+        (True, False), (None, True, False)
+    ):
+        factor_table(founder, trait)
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap(evaluate, filenames, chunksize=16):
+            yield json.dumps(result, allow_nan=False)
+
+
+def evaluate_family(filename, **options):
+    """
+    Return a JSON-serialisable dict with the gene and trait distributions
+    of everyone in the family in `filename`, or the reason it could not
+    be evaluated.
+    """
+    result = {"family": filename}
+    try:
+        people = load_data(filename)
+        probabilities, errors = infer(people, **options)
+    except (OSError, KeyError, ValueError, csv.Error) as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+        return result
+    result["probabilities"] = probabilities
+    if errors is not None:
+        result["errors"] = errors
+    return result
+
+
+def empty_probabilities(people):
+    """
+    Return a probabilities dictionary with every distribution set to 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,38 +217,534 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+def enumerate_probabilities(people):
+    """
+    Compute every person's gene and trait distributions by summing the
+    joint probability of every assignment consistent with the evidence.
+    """
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    # Loop over all sets of people who might have the trait,
+    # given known information
+    for have_trait in trait_assignments(people):
+
+        # Loop over all ways people might have the gene
+        for one_gene, two_genes in gene_assignments(people):
+
+            # Update probabilities with new joint probability
+            p = joint_probability(people, one_gene, two_genes, have_trait)
+            update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
+
+def tabulate_probabilities(people, workers=1):
+    """
+    Compute every person's gene and trait distributions exactly by
+    enumerating gene assignments only, using precomputed factor tables.
+
+    Unknown traits are summed out analytically: each gene assignment adds
+    its probability times P(trait | genes) to the trait totals, so the
+    2 ** n trait subsets are never enumerated. The 3 ** n gene assignments
+    are processed in chunks sharing the gene counts of the first people.
+
+    With more than one worker, chunks are tabulated by a process pool. The
+    chunks do not depend on the number of workers and their totals are
+    always added in the same order, so results are bit-for-bit identical
+    however many workers are used.
+    """
+    tables = pedigree_tables(people)
+    names = tables[0]
+    prefixes = chunk_prefixes(names)
+    tabulate = functools.partial(tabulate_chunk, tables)
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            chunks = pool.map(tabulate, prefixes)
+    else:
+        chunks = map(tabulate, prefixes)
+
+    totals = [0] * (3 * len(names))
+    traits = [0] * len(names)
+    for chunk_totals, chunk_traits in chunks:
+        for i, p in enumerate(chunk_totals):
+            totals[i] += p
+        for i, p in enumerate(chunk_traits):
+            traits[i] += p
+    return table_probabilities(names, totals, traits)
+
+
+def pedigree_tables(people):
+    """
+    Return (names, parents, factors, truths) describing `people` by index:
+    `parents[i]` is the (mother, father) index pair of person i, or (i, i)
+    for people without parents; `factors[i][9 * g + 3 * m + f]` is the
+    probability of person i having g copies of the gene and their known
+    trait, given parents with m and f copies; `truths[i][g]` is the
+    probability of person i having the trait given g copies.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    parents = []
+    factors = []
+    truths = []
+    for i, name in enumerate(names):
+        trait = people[name]["trait"]
+        mother = people[name]["mother"]
+        father = people[name]["father"]
+        if mother is None:
+            parents.append((i, i))
+        else:
+            parents.append((index[mother], index[father]))
+        factors.append(factor_table(mother is None, trait))
+        if trait is None:
+            truths.append([PROBS["trait"][genes][True] for genes in GENES])
+        else:
+            truths.append([1 if trait else 0] * 3)
+    return names, parents, factors, truths
+
+
+def chunk_prefixes(names):
+    """
+    Return the list of gene count tuples fixed for the first people in
+    each chunk of the assignment space, in a fixed order.
+    """
+    return list(itertools.product(
+        GENES, repeat=min(CHUNK_PREFIX, len(names))
+    ))
+
+
+def tabulate_chunk(tables, prefix):
+    """
+    Sum the joint probability of every gene assignment starting with the
+    gene counts in `prefix`. Return (totals, traits) lists, where
+    `totals[3 * i + g]` is the probability mass with person i having g
+    copies, and `traits[i]` the mass with person i having the trait.
+    """
+    names, parents, factors, truths = tables
+    people = [
+        (i, mother, father, factors[i], truths[i])
+        for i, (mother, father) in enumerate(parents)
+    ]
+    totals = [0] * (3 * len(names))
+    traits = [0] * len(names)
+    for rest in itertools.product(GENES, repeat=len(names) - len(prefix)):
+        genes = prefix + rest
+        p = 1
+        for i, mother, father, factor, _ in people:
+            p *= factor[9 * genes[i] + 3 * genes[mother] + genes[father]]
+        if not p:
+            continue
+        for i, mother, father, factor, truth in people:
+            totals[3 * i + genes[i]] += p
+            traits[i] += p * truth[genes[i]]
+    return totals, traits
+
+
+def table_probabilities(names, totals, traits):
+    """
+    Return a normalized probabilities dictionary from the gene and trait
+    totals computed by `tabulate_chunk`.
+    """
+    probabilities = empty_probabilities(names)
+    for i, person in enumerate(names):
+        total = sum(totals[3 * i:3 * i + 3])
+        for genes in GENES:
+            probabilities[person]["gene"][genes] = totals[3 * i + genes] / total
+        trait = min(traits[i] / total, 1)
+        probabilities[person]["trait"][True] = trait
+        probabilities[person]["trait"][False] = 1 - trait
+    return probabilities
+
+
+def sample_probabilities(people, samples=SAMPLES, seconds=None, seed=None):
+    """
+    Estimate every person's gene and trait distributions by Gibbs sampling,
+    for pedigrees too large or too loopy for exact inference.
+
+    Each sweep redraws every person's gene count in turn from its
+    distribution given everyone else's: their own factor from
+    `pedigree_tables` times the factors of their children. Estimates
+    average those conditional distributions rather than the drawn counts,
+    and unknown traits contribute P(trait | genes) rather than a sampled
+    value. After up to `BURN_IN` discarded sweeps, sampling stops after
+    `samples` sweeps, or once `seconds` have passed if that comes first;
+    passing the same `seed` repeats the same sweeps.
+
+    Return a tuple (probabilities, errors) of dictionaries shaped like the
+    result of `enumerate_probabilities`, where `errors` holds the standard
+    error of each estimate, computed from the spread between batches of
+    consecutive sweeps, or None if there were too few sweeps to tell.
+    """
+    if samples < 1:
+        raise ValueError("samples must be positive")
+    rng = random.Random(seed)
+    names, parents, factors, truths = pedigree_tables(people)
+    children = [[] for _ in names]
+    for i, (mother, father) in enumerate(parents):
+        if mother != i:
+            children[mother].append(i)
+            children[father].append(i)
+    plan = [
+        (
+            i, factors[i], parents[i],
+            [(factors[child], parents[child], child) for child in children[i]]
+        )
+        for i in range(len(names))
+    ]
+
+    # Start from a draw in which everyone fits their own factor
+    genes = [0] * len(names)
+    for i in ancestral_order(parents):
+        mother, father = parents[i]
+        base = 3 * genes[mother] + genes[father]
+        genes[i] = rng.choices(
+            GENES, [factors[i][9 * g + base] for g in GENES]
+        )[0]
+
+    def sweep(totals):
+        for i, factor, (mother, father), family in plan:
+            weights = []
+            for g in GENES:
+                genes[i] = g
+                w = factor[9 * g + 3 * genes[mother] + genes[father]]
+                for child_factor, (m, f), child in family:
+                    w *= child_factor[
+                        9 * genes[child] + 3 * genes[m] + genes[f]
+                    ]
+                weights.append(w)
+            total = weights[0] + weights[1] + weights[2]
+            u = rng.random() * total
+            if u < weights[0]:
+                genes[i] = 0
+            elif u < weights[0] + weights[1]:
+                genes[i] = 1
+            else:
+                genes[i] = 2
+            if totals is not None:
+                for g in GENES:
+                    totals[3 * i + g] += weights[g] / total
+
+    # Burn in for at most a tenth of the sweeps and of the time budget
+    start = time.monotonic()
+    deadline = None if seconds is None else start + seconds
+    for _ in range(min(BURN_IN, samples // 10)):
+        if deadline is not None and time.monotonic() >= start + seconds / 10:
+            break
+        sweep(None)
+
+    # Keep between MIN_BATCHES and twice as many batches of equal length,
+    # merging neighbouring batches and doubling the length when full
+    batches = []
+    length = 1
+    totals = [0] * (3 * len(names))
+    swept = 0
+    drawn = 0
+    while drawn < samples:
+        if deadline is not None and drawn >= 2:
+            if time.monotonic() >= deadline:
+                break
+        sweep(totals)
+        swept += 1
+        drawn += 1
+        if swept == length:
+            batches.append(totals)
+            totals = [0] * (3 * len(names))
+            swept = 0
+            if len(batches) == 2 * MIN_BATCHES:
+                batches = [
+                    [a + b for a, b in zip(first, second)]
+                    for first, second in zip(batches[::2], batches[1::2])
+                ]
+                length *= 2
+
+    # Pool all sweeps for the estimates, and compare batches for the errors
+    pooled = [
+        sum(batch[k] for batch in batches) + totals[k]
+        for k in range(3 * len(names))
+    ]
+    traits = [
+        sum(pooled[3 * i + g] * truths[i][g] for g in GENES)
+        for i in range(len(names))
+    ]
+    probabilities = table_probabilities(names, pooled, traits)
+
+    errors = empty_probabilities(names)
+    for i, person in enumerate(names):
+        for g in GENES:
+            errors[person]["gene"][g] = standard_error(
+                [batch[3 * i + g] / length for batch in batches]
+            )
+        error = standard_error([
+            sum(batch[3 * i + g] * truths[i][g] for g in GENES) / length
+            for batch in batches
+        ])
+        errors[person]["trait"][True] = error
+        errors[person]["trait"][False] = error
+    return probabilities, errors
+
+
+def ancestral_order(parents):
+    """
+    Return the person indices ordered so that everyone comes after their
+    parents, given `parents` as returned by `pedigree_tables`.
+
+    Raises ValueError if someone is their own ancestor.
+    """
+    order = []
+    placed = set()
+    visiting = set()
+    for person in range(len(parents)):
+        stack = [person]
+        while stack:
+            current = stack[-1]
+            if current in placed:
+                stack.pop()
+                continue
+            missing = [
+                parent for parent in set(parents[current])
+                if parent != current and parent not in placed
+            ]
+            if not missing:
+                stack.pop()
+                visiting.discard(current)
+                placed.add(current)
+                order.append(current)
+                continue
+            if any(parent in visiting for parent in missing):
+                raise ValueError("cyclic pedigree")
+            visiting.add(current)
+            stack.extend(missing)
+    return order
+
+
+def standard_error(estimates):
+    """
+    Return the standard error of the mean of a list of batch `estimates`,
+    or None if there are too few to tell.
+    """
+    if len(estimates) < 2:
+        return None
+    mean = sum(estimates) / len(estimates)
+    variance = sum(
+        (estimate - mean) ** 2 for estimate in estimates
+    ) / (len(estimates) - 1)
+    return math.sqrt(variance / len(estimates))
+
+
+def eliminate_probabilities(people):
+    """
+    Compute every person's gene and trait distributions exactly by
+    variable elimination over the pedigree.
+
+    Each person contributes one factor over their own gene count and their
+    parents' gene counts: the probability of inheriting that many copies,
+    times the probability of their trait if it is known. Gene variables are
+    summed out one at a time, cheapest first, and the intermediate results
+    are then passed back down, so that everyone's marginal comes out of two
+    passes. This takes polynomial time on tree-shaped pedigrees.
+    """
+    factors = [person_factor(people, person) for person in people]
+    order = elimination_order(people)
+    position = {person: i for i, person in enumerate(order)}
+
+    # Each factor belongs to the first of its variables to be eliminated
+    local = [[] for _ in order]
+    for factor in factors:
+        local[min(position[name] for name in factor[0])].append(factor)
+
+    # Eliminate every variable in turn, sending the result on to the
+    # first of its remaining variables
+    up = [None] * len(order)
+    parent = [None] * len(order)
+    children = [[] for _ in order]
+    for i, person in enumerate(order):
+        incoming = local[i] + [up[child] for child in children[i]]
+        scope = set(name for names, _ in incoming for name in names)
+        up[i] = marginalize(incoming, scope - {person})
+        if up[i][0]:
+            parent[i] = min(position[name] for name in up[i][0])
+            children[parent[i]].append(i)
+
+    # Pass back what every other part of the pedigree says about each scope
+    down = [None] * len(order)
+    for i in reversed(range(len(order))):
+        base = local[i] + ([down[i]] if parent[i] is not None else [])
+        for child in children[i]:
+            others = [up[other] for other in children[i] if other != child]
+            down[child] = marginalize(base + others, up[child][0])
+
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(order):
+        incoming = local[i] + [up[child] for child in children[i]]
+        if parent[i] is not None:
+            incoming.append(down[i])
+        _, distribution = marginalize(incoming, {person})
+        for genes in GENES:
+            probabilities[person]["gene"][genes] = distribution[(genes,)]
+
+        trait = people[person]["trait"]
+        if trait is None:
+            p = sum(
+                distribution[(genes,)] * PROBS["trait"][genes][True]
+                for genes in GENES
+            )
+        else:
+            p = 1 if trait else 0
+        probabilities[person]["trait"][True] = p
+        probabilities[person]["trait"][False] = 1 - p
+    return probabilities
+
+
+def inheritance_probability(genes, mother_genes, father_genes):
+    """
+    Return the probability that a child has `genes` copies of the gene,
+    given how many copies their mother and father have.
+    """
+    mget = pass_probability(mother_genes)
+    fget = pass_probability(father_genes)
+    if genes == 2:
+        return mget * fget
+    elif genes == 1:
+        return mget * (1 - fget) + (1 - mget) * fget
+    else:
+        return (1 - mget) * (1 - fget)
+
+
+def pass_probability(genes):
+    """
+    Return the probability that a parent with `genes` copies of the gene
+    passes a copy on to their child.
+    """
+    if genes == 2:
+        return 1 - PROBS["mutation"]
+    elif genes == 1:
+        return 0.5
+    else:
+        return PROBS["mutation"]
+
+
+def person_factor(people, person):
+    """
+    Return the factor contributed by `person` as a tuple (variables, values),
+    where `variables` is a tuple of names and `values` maps each tuple of
+    their gene counts to a probability.
+    """
+    trait = people[person]["trait"]
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    if mother is None:
+        return (person,), factor_values(True, trait)
+    return (person, mother, father), factor_values(False, trait)
+
+
+@functools.lru_cache(maxsize=None)
+def factor_values(founder, trait):
+    """
+    Return the values of the factor contributed by a person with the known
+    `trait` (None if unknown), mapping (genes,) to a probability if they
+    are a `founder` without parents in the data, and (genes, mother_genes,
+    father_genes) otherwise.
+
+    The values depend only on `PROBS`, so they are computed once and shared
+    by everyone in every family; callers must not modify them.
+    """
+    def evidence(genes):
+        return 1 if trait is None else PROBS["trait"][genes][trait]
+
+    if founder:
+        return {
+            (genes,): PROBS["gene"][genes] * evidence(genes)
+            for genes in GENES
+        }
+    return {
+        (genes, mother_genes, father_genes): (
+            inheritance_probability(genes, mother_genes, father_genes)
+            * evidence(genes)
+        )
+        for genes, mother_genes, father_genes
+        in itertools.product(GENES, repeat=3)
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def factor_table(founder, trait):
+    """
+    Return the values of `factor_values(founder, trait)` as a flat tuple
+    indexed by 9 * genes + 3 * mother_genes + father_genes, as used by
+    `pedigree_tables`.
+    """
+    values = factor_values(founder, trait)
+    return tuple(
+        values[(genes,)] if founder
+        else values[(genes, mother_genes, father_genes)]
+        for genes, mother_genes, father_genes
+        in itertools.product(GENES, repeat=3)
+    )
+
+
+def elimination_order(people):
+    """
+    Return a list of everyone in `people` in the order their gene variables
+    should be eliminated, greedily choosing the person with the fewest
+    neighbors in the pedigree's moral graph (where each person is linked
+    to their parents and the parents are linked to each other).
+    """
+    neighbors = {person: set() for person in people}
     for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+        family = [person] + [
+            parent for parent in (
+                people[person]["mother"], people[person]["father"]
+            )
+            if parent is not None
+        ]
+        for a in family:
+            neighbors[a].update(b for b in family if b != a)
+
+    order = []
+    while neighbors:
+        person = min(
+            neighbors, key=lambda person: (len(neighbors[person]), person)
+        )
+        for neighbor in neighbors[person]:
+            neighbors[neighbor].update(neighbors[person] - {neighbor})
+            neighbors[neighbor].discard(person)
+        del neighbors[person]
+        order.append(person)
+    return order
+
+
+def marginalize(factors, keep):
+    """
+    Return the product of `factors`, with every variable not in `keep`
+    summed out, as a factor scaled to sum to 1. Variables in `keep` that no
+    factor mentions come out uniform.
+    """
+    scope = tuple(sorted(set(
+        name for names, _ in factors for name in names
+    ).union(keep)))
+    variables = tuple(sorted(keep))
+    values = {
+        assignment: 0
+        for assignment in itertools.product(GENES, repeat=len(variables))
+    }
+    for assignment in itertools.product(GENES, repeat=len(scope)):
+        genes_of = dict(zip(scope, assignment))
+        product = 1
+        for names, table in factors:
+            product *= table[tuple(genes_of[name] for name in names)]
+        values[tuple(genes_of[name] for name in variables)] += product
+
+    # Rescale so long pedigrees do not underflow
+    total = sum(values.values())
+    if total > 0:
+        for assignment in values:
+            values[assignment] /= total
+    return variables, values
 
 
 def load_data(filename):
@@ -118,14 +771,43 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Yield all possible subsets of set s, one at a time.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
+
+
+def trait_assignments(people):
+    """
+    Yield every set of people who might have the trait that agrees with
+    the known traits, without generating any that do not.
+    """
+    known = set(
+        person for person in people if people[person]["trait"] is True
+    )
+    unknown = [person for person in people if people[person]["trait"] is None]
+    for subset in powerset(unknown):
+        yield known | subset
+
+
+def gene_assignments(people):
+    """
+    Yield every (one_gene, two_genes) pair of disjoint sets of people,
+    decoding each from a vector of gene counts generated on demand.
+    """
+    names = list(people)
+    for genes in itertools.product(GENES, repeat=len(names)):
+        one_gene = set()
+        two_genes = set()
+        for name, count in zip(names, genes):
+            if count == 1:
+                one_gene.add(name)
+            elif count == 2:
+                two_genes.add(name)
+        yield one_gene, two_genes
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
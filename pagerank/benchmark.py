@@ -0,0 +1,139 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from pagerank import (
+    DAMPING, SAMPLES, LinkGraph, crawl_graph, power_iteration, sample_ranks
+)
+
+# Corpora shipped with the project, and sizes of the generated graphs
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+SIZES = [1000, 10000, 100000]
+
+# Average number of links per generated page
+MEAN_LINKS = 8
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--sizes N ...] [--samples N] "
+              "[--seed N] [--output FILE]"
+    )
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES)
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", metavar="FILE")
+    args = parser.parse_args()
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    graphs = [
+        (corpus, crawl_graph(os.path.join(directory, corpus)))
+        for corpus in CORPORA
+    ]
+    graphs.extend(
+        (f"synthetic-{size}", synthetic_graph(size, MEAN_LINKS, args.seed))
+        for size in args.sizes
+    )
+
+    results = []
+    for name, graph in graphs:
+        results.extend(benchmark(name, graph, args.samples, args.seed))
+        print(f"{name}: done", file=sys.stderr)
+
+    report = json.dumps(
+        {"damping": DAMPING, "results": results}, indent=2, allow_nan=False
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+def benchmark(name, graph, samples, seed):
+    """
+    Run the iterative and sampling engines on `graph` and return a list
+    of result dictionaries, one per engine.
+    """
+    def iterate():
+        history = []
+        return power_iteration(graph, DAMPING, history=history), history
+
+    (ranks, history), seconds, peak = measure(iterate)
+    iterate_result = {
+        "graph": name,
+        "pages": len(graph),
+        "links": len(graph.links),
+        "engine": "iterate",
+        "iterations": len(history),
+        "residuals": history,
+        "seconds": seconds,
+        "peak_bytes": peak
+    }
+
+    (sampled, errors), seconds, peak = measure(
+        lambda: sample_ranks(graph, DAMPING, samples, seed)
+    )
+
+    # A single walker gives no interval, reported as null
+    max_interval = max(errors)
+    if math.isinf(max_interval):
+        max_interval = None
+    sample_result = {
+        "graph": name,
+        "pages": len(graph),
+        "links": len(graph.links),
+        "engine": "sample",
+        "samples": samples,
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "l1_error": sum(abs(a - b) for a, b in zip(sampled, ranks)),
+        "max_interval": max_interval
+    }
+    return [iterate_result, sample_result]
+
+
+def measure(function):
+    """
+    Call `function` and return its result, the wall time it took in
+    seconds, and the peak memory it allocated in bytes. Memory is traced
+    in a second call so that tracing does not skew the timing.
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def synthetic_graph(pages, mean_links, seed):
+    """
+    Return a random LinkGraph of `pages` pages. Link targets are biased
+    towards low-numbered pages, giving a few heavily linked hubs, and some
+    pages have no links at all.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    links = []
+    for i in range(pages):
+        count = min(int(rng.expovariate(1 / mean_links)), pages - 1)
+        targets = set()
+        while len(targets) < count:
+            target = int(pages * rng.random() ** 2)
+            if target != i:
+                targets.add(target)
+        links.append(sorted(targets))
+    return LinkGraph(names, links)
+
+
+if __name__ == "__main__":
+    main()
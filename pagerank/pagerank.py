@@ -1,78 +1,203 @@
+import argparse
+import json
+import math
+import multiprocessing
 import os
 import random
 import re
 import sys
-import copy
+from array import array
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Number of independent random surfers sharing the samples, and the z-score
+# of the reported confidence intervals
+WALKERS = 16
+CONFIDENCE_Z = 1.96
+
+# Pattern of a link in an HTML page, and the size of the chunks pages are
+# streamed through it in
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+CHUNK_SIZE = 1 << 16
+
+# Power iteration stops once the L1 change between rounds is below TOLERANCE,
+# or after MAX_ITERATIONS rounds
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    parser = argparse.ArgumentParser(
+        usage="python pagerank.py corpus [--state FILE] [--workers N] "
+              "[--seeds PAGES ...]"
+    )
+    parser.add_argument("corpus")
+    parser.add_argument(
+        "--state", metavar="FILE",
+        help="reuse and update the links and ranks saved in FILE"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of processes parsing pages"
+    )
+    parser.add_argument(
+        "--seeds", metavar="PAGES", action="append", default=[],
+        help="also rank pages personalised to these comma-separated seed "
+             "pages; may be repeated"
+    )
+    args = parser.parse_args()
+
+    if args.state is not None:
+        graph, ranks = incremental_pagerank(
+            args.corpus, args.state, DAMPING, args.workers
+        )
+        corpus = graph.corpus()
+        ranks = graph.ranking(ranks)
+    else:
+        corpus = crawl(args.corpus, args.workers)
+        ranks = iterate_pagerank(corpus, DAMPING)
+
+    sampled, errors = sample_pagerank_interval(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    for page in sorted(sampled):
+        print(f"  {page}: {sampled[page]:.4f} ± {errors[page]:.4f}")
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
+    if args.seeds:
+        graph = LinkGraph.from_corpus(corpus)
+        seed_sets = [seeds.split(",") for seeds in args.seeds]
+        try:
+            personalized = personalized_pagerank(graph, seed_sets, DAMPING)
+        except ValueError as e:
+            sys.exit(f"Invalid seeds: {e}")
+        for seeds, ranks in zip(args.seeds, personalized):
+            print(f"Personalised PageRank Results (seeds = {seeds})")
+            ranks = graph.ranking(ranks)
+            for page in sorted(ranks):
+                print(f"  {page}: {ranks[page]:.4f}")
+
 
-def crawl(directory):
+def crawl(directory, workers=1):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+    return crawl_graph(directory, workers).corpus()
+
+
+def crawl_graph(directory, workers=1, parsed=None):
+    """
+    Parse a directory of HTML pages into a LinkGraph, keeping only links
+    to other pages in the corpus. With more than one worker, pages are
+    parsed by a process pool.
+
+    If given, `parsed` maps page names to [size, mtime_ns, links] from an
+    earlier crawl. Pages whose size and modification time are unchanged
+    are not parsed again, and `parsed` is updated to match the directory.
+    """
+    if parsed is None:
+        parsed = dict()
+    with os.scandir(directory) as entries:
+        stats = {
+            entry.name: entry.stat()
+            for entry in entries
+            if entry.name.endswith(".html") and entry.is_file()
+        }
+    pages = sorted(stats)
+    index = {page: i for i, page in enumerate(pages)}
 
-    return pages
+    for page in set(parsed) - set(stats):
+        del parsed[page]
+    changed = [
+        page for page in pages
+        if parsed.get(page, [None, None])[:2]
+        != [stats[page].st_size, stats[page].st_mtime_ns]
+    ]
 
+    # Parse only new and modified pages
+    paths = [os.path.join(directory, page) for page in changed]
+    if workers > 1 and len(changed) > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.imap(extract_links, paths, chunksize=64)
+            for page, targets in zip(changed, results):
+                stat = stats[page]
+                parsed[page] = [stat.st_size, stat.st_mtime_ns, sorted(targets)]
+    else:
+        for page, path in zip(changed, paths):
+            stat = stats[page]
+            parsed[page] = [
+                stat.st_size, stat.st_mtime_ns, sorted(extract_links(path))
+            ]
 
-def transition_model(corpus, page, damping_factor):
+    links = [
+        page_indices(parsed[page][2], index, i)
+        for i, page in enumerate(pages)
+    ]
+    return LinkGraph(pages, links)
+
+
+def extract_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Return the set of link targets in the HTML file at `path`, reading
+    it in chunks of `chunk_size` characters rather than all at once.
+    """
+    links = set()
+    pending = ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while chunk := f.read(chunk_size):
+            pending += chunk
+
+            # Hold back everything after the last complete tag, which may
+            # continue in the next chunk
+            cut = pending.rfind(">") + 1
+            if cut <= 0:
+                continue
+            links.update(LINK.findall(pending, 0, cut))
+            pending = pending[cut:]
+    links.update(LINK.findall(pending))
+    return links
+
+
+def page_indices(links, index, page):
+    """
+    Return a sorted array of the indices of the pages in `links`, leaving
+    out links outside the corpus and links from `page` to itself.
+    """
+    return array("i", sorted(
+        index[link] for link in links
+        if link in index and index[link] != page
+    ))
+
+
+def transition_model(corpus, page, damping_factor, teleport=None):
     """
     Return a probability distribution over which page to visit next,
     given a current page.
 
     With probability `damping_factor`, choose a link at random
     linked to by `page`. With probability `1 - damping_factor`, choose
-    a link at random chosen from all pages in the corpus.
+    a link at random chosen from all pages in the corpus, or according to
+    the `teleport` distribution over pages if one is given. A page with no
+    links always chooses the next page that way.
     """
+    if teleport is None:
+        teleport = {value: 1 / len(corpus) for value in corpus}
     page_links = len(corpus[page])
-    corpus_links = len(corpus)
+    jump = 1 - damping_factor if page_links else 1
     prob_dist = dict()
     for value in corpus:
-        prob_dist[value] = (1 - damping_factor) / corpus_links
-    if page_links == 0:
-        pass
-    else:
-        for value in corpus[page]:
-            prob_dist[value] += damping_factor / page_links
-    
+        prob_dist[value] = jump * teleport.get(value, 0)
+    for value in corpus[page]:
+        prob_dist[value] += damping_factor / page_links
+
     return prob_dist
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None, walkers=WALKERS):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -81,63 +206,358 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    ranking = dict()
-    sample = random.choice(list(corpus))
-    samples = dict()
-    for i in range(n - 1):
-        model = transition_model(corpus, sample, damping_factor)
-        sample = random.choices(list(model), weights=model.values(), k=1).pop()
-        if sample in samples:
-            samples[sample] += 1
+    return sample_pagerank_interval(corpus, damping_factor, n, seed, walkers)[0]
+
+
+def sample_pagerank_interval(corpus, damping_factor, n,
+                             seed=None, walkers=WALKERS):
+    """
+    Estimate PageRank by splitting `n` samples between `walkers`
+    independent random surfers, each starting on a random page.
+
+    Return a tuple (ranking, errors) of dictionaries keyed by page name:
+    the estimated PageRank of each page, and the half-width of its
+    confidence interval, computed from the spread between surfers.
+    Passing the same `seed` reproduces the same estimates.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks, errors = sample_ranks(graph, damping_factor, n, seed, walkers)
+    return graph.ranking(ranks), graph.ranking(errors)
+
+
+def sample_ranks(graph, damping_factor, n, seed=None, walkers=WALKERS):
+    """
+    Return lists (ranks, errors) indexed like `graph.pages`, estimated
+    as described in `sample_pagerank_interval`.
+    """
+    pages = len(graph)
+    rng = random.Random(seed)
+
+    # Outgoing links of every page, looked up once per step
+    links = [
+        graph.links[graph.offsets[i]:graph.offsets[i + 1]]
+        for i in range(pages)
+    ]
+
+    walkers = max(1, min(walkers, n))
+    estimates = []
+    for walker in range(walkers):
+        steps = n // walkers + (walker < n % walkers)
+        visits = [0] * pages
+        page = rng.randrange(pages)
+        for _ in range(steps):
+            visits[page] += 1
+            outgoing = links[page]
+            if outgoing and rng.random() < damping_factor:
+                page = outgoing[rng.randrange(len(outgoing))]
+            else:
+                page = rng.randrange(pages)
+        estimates.append([count / steps for count in visits])
+
+    ranks = []
+    errors = []
+    for i in range(pages):
+        values = [estimate[i] for estimate in estimates]
+        mean = sum(values) / walkers
+        if walkers > 1:
+            variance = sum(
+                (value - mean) ** 2 for value in values
+            ) / (walkers - 1)
+            errors.append(CONFIDENCE_Z * math.sqrt(variance / walkers))
         else:
-            samples[sample] = 1
-    for page in corpus:
-        ranking[page] = samples[page] / n
-    sum = 0
-    for page in ranking:
-        sum += ranking[page]
-    if sum != 1.0:
-        for page in ranking:
-            ranking[page] = ranking[page] / sum
-    return ranking
+            errors.append(math.inf)
+        ranks.append(mean)
+    return ranks, errors
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS, teleport=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
+    If `teleport` is given, random jumps follow it instead of choosing a
+    page uniformly; see `personalized_pagerank`.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    ranking = dict()
-    newranking = dict()
-    for page in corpus:
-        ranking[page] = 1 / len(corpus)
-    while True:
-        iteration = 0
-        for page in corpus:
-            sigma = 0
-            for p2 in corpus:
-                if page in corpus[p2]:
-                    sigma += ranking[p2] / len(corpus[p2])
-            
-            newranking[page] = (1 - damping_factor) / len(corpus) + (damping_factor * sigma)
-            if abs(ranking[page] - newranking[page]) < 0.0001:
-                iteration += 1
-            if iteration == len(corpus):
-                sum = 0
-                for page in newranking:
-                    sum += newranking[page]
-                while sum != 1.0:
-                    for page in newranking:
-                        newranking[page] = newranking[page] / sum
-                    sum = 0
-                    for page in newranking:
-                        sum += newranking[page]
-                return newranking
-        ranking = copy.deepcopy(newranking)
+    graph = LinkGraph.from_corpus(corpus)
+    if teleport is None:
+        ranks = power_iteration(
+            graph, damping_factor, tolerance, max_iterations
+        )
+    else:
+        ranks = personalized_pagerank(
+            graph, [teleport], damping_factor, tolerance, max_iterations
+        )[0]
+    return graph.ranking(ranks)
+
+
+def personalized_pagerank(graph, teleports, damping_factor,
+                          tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return a list of PageRank vectors indexed like `graph.pages`, one for
+    each teleport distribution in `teleports`.
+
+    Each teleport distribution is either a collection of seed page names,
+    jumped to uniformly, or a dictionary mapping page names to weights.
+    Random jumps, and the rank of pages with no links, follow it.
+
+    All vectors are iterated together, so each round walks the link
+    structure once for the whole batch; converged vectors drop out.
+    """
+    n = len(graph)
+    outdegree = graph.outdegree
+    offsets = graph.back_offsets
+    backlinks = graph.backlinks
+
+    vectors = [teleport_vector(graph, teleport) for teleport in teleports]
+    results = [list(vector) for vector in vectors]
+    active = list(range(len(vectors)))
+
+    for _ in range(max_iterations):
+        if not active:
+            break
+
+        # Rank each page passes along each of its links, per vector
+        shares = [
+            [
+                results[k][i] / outdegree[i] if outdegree[i] else 0
+                for i in range(n)
+            ]
+            for k in active
+        ]
+        new_ranks = [[0] * n for _ in active]
+        for i in range(n):
+            sources = backlinks[offsets[i]:offsets[i + 1]]
+            if not sources:
+                continue
+            for ranks, share in zip(new_ranks, shares):
+                ranks[i] = sum(map(share.__getitem__, sources))
+
+        still_active = []
+        for k, ranks in zip(active, new_ranks):
+            vector = vectors[k]
+            dangling = sum(results[k][i] for i in graph.dangling)
+            jump = 1 - damping_factor + damping_factor * dangling
+            ranks = [
+                damping_factor * rank + jump * weight
+                for rank, weight in zip(ranks, vector)
+            ]
+            total = sum(ranks)
+            ranks = [rank / total for rank in ranks]
+            residual = sum(
+                abs(new - old) for new, old in zip(ranks, results[k])
+            )
+            results[k] = ranks
+            if residual >= tolerance:
+                still_active.append(k)
+        active = still_active
+
+    return results
+
+
+def teleport_vector(graph, teleport):
+    """
+    Return the teleport distribution `teleport`, given as a collection of
+    seed page names or a dictionary of page weights, as a list indexed
+    like `graph.pages` that sums to 1.
+    """
+    if not isinstance(teleport, dict):
+        teleport = {page: 1 for page in teleport}
+    vector = [0] * len(graph)
+    for page, weight in teleport.items():
+        if page not in graph.index:
+            raise ValueError(f"unknown page {page!r}")
+        vector[graph.index[page]] += weight
+    total = sum(vector)
+    if total <= 0:
+        raise ValueError("teleport distribution has no weight")
+    return [weight / total for weight in vector]
+
+
+def incremental_pagerank(directory, state_file, damping_factor,
+                         workers=1, tolerance=TOLERANCE,
+                         max_iterations=MAX_ITERATIONS):
+    """
+    Crawl `directory` and compute its PageRank, reusing the parsed links
+    and ranks saved in `state_file` by a previous run, then save the new
+    links and ranks there.
+
+    Only pages changed since the previous run are parsed, and power
+    iteration starts from the previous ranks, so small edits to a large
+    corpus converge in a few rounds. Return the LinkGraph and its ranks.
+    """
+    state = load_state(state_file)
+    graph = crawl_graph(directory, workers, state["parsed"])
+
+    # Warm start: known pages keep their old rank, new pages start uniform
+    previous = state["ranks"]
+    initial = [previous.get(page, 1 / len(graph)) for page in graph.pages]
+    total = sum(initial)
+    initial = [rank / total for rank in initial]
+
+    ranks = power_iteration(
+        graph, damping_factor, tolerance, max_iterations, initial
+    )
+    save_state(state_file, state["parsed"], graph.ranking(ranks))
+    return graph, ranks
+
+
+def load_state(state_file):
+    """
+    Return the crawl state saved in `state_file`, with keys "parsed" and
+    "ranks", or an empty state if the file does not exist.
+    """
+    try:
+        with open(state_file) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"parsed": dict(), "ranks": dict()}
+
+
+def save_state(state_file, parsed, ranks):
+    """
+    Save the parsed links and ranks of a crawl to `state_file`.
+    """
+    temporary = f"{state_file}.tmp"
+    with open(temporary, "w") as f:
+        json.dump({"parsed": parsed, "ranks": ranks}, f)
+    os.replace(temporary, state_file)
+
+
+class LinkGraph():
+    """
+    Sparse link structure of a corpus over dense page indices.
+
+    The pages linked to by page `i` are
+    `links[offsets[i]:offsets[i + 1]]`, and the pages linking to it are
+    `backlinks[back_offsets[i]:back_offsets[i + 1]]`.
+    """
+
+    def __init__(self, pages, links):
+        """
+        Create a graph over the list of page names `pages`, where `links[i]`
+        holds the sorted indices of the pages linked to by `pages[i]`.
+        """
+        self.pages = pages
+        self.index = {page: i for i, page in enumerate(self.pages)}
+
+        self.offsets = array("i", [0])
+        self.links = array("i")
+        for targets in links:
+            self.links.extend(targets)
+            self.offsets.append(len(self.links))
+
+        self.outdegree = array("i", (
+            self.offsets[i + 1] - self.offsets[i]
+            for i in range(len(self.pages))
+        ))
+        self.dangling = [
+            i for i in range(len(self.pages)) if self.outdegree[i] == 0
+        ]
+
+        # Invert the links, keeping each page's backlinks sorted
+        backlinks = [[] for _ in self.pages]
+        for i in range(len(self.pages)):
+            for j in self.links[self.offsets[i]:self.offsets[i + 1]]:
+                backlinks[j].append(i)
+        self.back_offsets = array("i", [0])
+        self.backlinks = array("i")
+        for sources in backlinks:
+            self.backlinks.extend(sources)
+            self.back_offsets.append(len(self.backlinks))
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Create a graph from a corpus dictionary as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        return cls(pages, [
+            sorted(index[link] for link in corpus[page]) for page in pages
+        ])
+
+    def __len__(self):
+        return len(self.pages)
+
+    def corpus(self):
+        """
+        Return the graph as a corpus dictionary mapping each page name
+        to the set of page names it links to.
+        """
+        return {
+            page: set(
+                self.pages[j]
+                for j in self.links[self.offsets[i]:self.offsets[i + 1]]
+            )
+            for i, page in enumerate(self.pages)
+        }
+
+    def ranking(self, ranks):
+        """
+        Return a dictionary mapping page names to their values in `ranks`.
+        """
+        return {page: ranks[i] for i, page in enumerate(self.pages)}
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, initial=None, history=None):
+    """
+    Return a list of PageRank values indexed like `graph.pages`, computed
+    by power iteration from `initial`, or from a uniform distribution.
+    If `history` is a list, the L1 residual of every round is appended
+    to it.
+
+    A page with no links is treated as linking to every page, including
+    itself, so no rank is lost through dangling pages.
+    """
+    n = len(graph)
+    ranks = [1 / n] * n if initial is None else initial
+    for _ in range(max_iterations):
+        new_ranks, residual = pagerank_step(graph, ranks, damping_factor)
+        ranks = new_ranks
+        if history is not None:
+            history.append(residual)
+        if residual < tolerance:
+            break
+    return ranks
+
+
+def pagerank_step(graph, ranks, damping_factor):
+    """
+    Apply one round of the PageRank update to `ranks`.
+    Return the new ranks and their L1 distance from `ranks`.
+    """
+    n = len(graph)
+    outdegree = graph.outdegree
+
+    # Rank each page passes along each of its links
+    shares = [
+        ranks[i] / outdegree[i] if outdegree[i] else 0
+        for i in range(n)
+    ]
+    dangling = sum(ranks[i] for i in graph.dangling)
+    base = (1 - damping_factor) / n + damping_factor * dangling / n
+
+    offsets = graph.back_offsets
+    backlinks = graph.backlinks
+    new_ranks = [
+        base + damping_factor * sum(map(
+            shares.__getitem__, backlinks[offsets[i]:offsets[i + 1]]
+        ))
+        for i in range(n)
+    ]
+
+    # Correct floating point drift once, rather than looping on it
+    total = sum(new_ranks)
+    new_ranks = [rank / total for rank in new_ranks]
+
+    residual = sum(abs(new - old) for new, old in zip(new_ranks, ranks))
+    return new_ranks, residual
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from pagerank import LINK, extract_links
+
+# Pages whose anchors are awkward to cut into chunks
+PAGES = [
+    '<p>hi</p><a title="a<b" href="x.html">x',
+    '<a href="1.html">1</a><p>a < b</p><a\nhref="2.html">2</a>',
+    '<html><body><a class="c" href="3.html">3</a></body></html>',
+]
+
+
+@pytest.mark.parametrize("page", PAGES)
+def test_chunked_links_match_whole_file(tmp_path, page):
+    path = os.path.join(tmp_path, "page.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+
+    expected = set(LINK.findall(page))
+    for chunk_size in range(1, len(page) + 2):
+        assert extract_links(path, chunk_size) == expected